@@ -1,14 +1,27 @@
 import sys
 import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.oxml.xmlchemy import OxmlElement
 import os
 import tempfile
 import re
+import json
+import shutil
+import multiprocessing
+import queue
+import ctypes
+import time
+import threading
+from collections import OrderedDict
 from PIL import Image
 from tqdm import tqdm
 
+# pdfium is not thread safe; every render or pdfium text read must hold this lock
+PDFIUM_LOCK = threading.Lock()
+
 class TemplateManager:
     @staticmethod
     def get_template_path():
@@ -38,21 +51,270 @@ class TemplateManager:
         prs = Presentation()
         prs.save(target_path)
 
+class BatchJournal:
+    """Record batch progress on disk so an interrupted run can resume where it stopped."""
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.files = {}
+        self.load()
+
+    def load(self):
+        """(Re)load the journal from disk."""
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get('files', {})
+        else:
+            self.files = {}
+
+    def save(self):
+        """Write the journal atomically so a crash never leaves it half written."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files}, f, indent=2)
+        os.replace(tmp_path, self.journal_path)
+
+    @staticmethod
+    def fingerprint(pdf_path):
+        """Size and modification time, so a replaced PDF is not mistaken for the old one."""
+        stat = os.stat(pdf_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def lookup(self, pdf_path):
+        """Return the journal entry of the PDF, or an empty one if the file has changed since."""
+        entry = self.files.get(os.path.abspath(pdf_path), {})
+        if entry.get('fingerprint') != self.fingerprint(pdf_path):
+            return {}
+        return entry
+
+    def entry(self, pdf_path):
+        """Return the entry to update, starting a fresh one if the file has changed."""
+        entry = self.lookup(pdf_path)
+        if not entry:
+            entry = {'fingerprint': self.fingerprint(pdf_path)}
+            self.files[os.path.abspath(pdf_path)] = entry
+        return entry
+
+    def work_dir(self, pdf_path):
+        """Directory holding the captured question images of an unfinished file."""
+        base = os.path.splitext(self.journal_path)[0] + '_work'
+        return os.path.join(base, os.path.splitext(os.path.basename(pdf_path))[0])
+
+    def is_completed(self, pdf_path, output_path):
+        entry = self.lookup(pdf_path)
+        return entry.get('status') == 'completed' and os.path.exists(output_path)
+
+    def failed_files(self):
+        """PDFs that failed or timed out and should be retried."""
+        return [path for path, entry in self.files.items() if entry.get('status') == 'failed']
+
+    def get_questions(self, pdf_path):
+        return self.lookup(pdf_path).get('questions')
+
+    def record_questions(self, pdf_path, questions):
+        entry = self.entry(pdf_path)
+        entry['status'] = 'in_progress'
+        entry['questions'] = questions
+        entry['done'] = []
+        self.save()
+
+    def completed_questions(self, pdf_path):
+        return set(self.lookup(pdf_path).get('done', []))
+
+    def mark_question(self, pdf_path, question_number):
+        entry = self.entry(pdf_path)
+        entry.setdefault('done', []).append(question_number)
+        self.save()
+
+    def mark_completed(self, pdf_path, output_path):
+        self.files[os.path.abspath(pdf_path)] = {
+            'status': 'completed',
+            'output': output_path,
+            'fingerprint': self.fingerprint(pdf_path)
+        }
+        self.save()
+        shutil.rmtree(self.work_dir(pdf_path), ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(self.work_dir(pdf_path)))
+        except OSError:
+            pass
+
+    def mark_failed(self, pdf_path, error):
+        entry = self.entry(pdf_path)
+        entry['status'] = 'failed'
+        entry['error'] = error
+        entry['attempts'] = entry.get('attempts', 0) + 1
+        self.save()
+
+class PreviewRenderer:
+    """Render low resolution page images for previews, keeping the most recent pages cached.
+
+    Not thread safe: use a renderer from a single thread only.
+    """
+
+    def __init__(self, pdf_path, resolution=50, cache_size=12):
+        self.pdf = pdfplumber.open(pdf_path)
+        self.resolution = resolution
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    @property
+    def scale(self):
+        """Pixels per PDF point at the preview resolution."""
+        return self.resolution / 72
+
+    def page_sizes(self):
+        """Return (width, height) of every page in PDF points."""
+        return [(page.width, page.height) for page in self.pdf.pages]
+
+    def render_page(self, page_num):
+        """Return a PIL image of the page, rendering it only if it is not cached."""
+        if page_num in self.cache:
+            self.cache.move_to_end(page_num)
+            return self.cache[page_num]
+
+        page = self.pdf.pages[page_num]
+        with PDFIUM_LOCK:
+            img = page.to_image(resolution=self.resolution).original
+        # Drop pdfminer's parsed layout, the preview only needs the pixels
+        page.close()
+
+        self.cache[page_num] = img
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return img
+
+    def close(self):
+        self.cache.clear()
+        self.pdf.close()
+
+class DetectionCancelled(Exception):
+    """Raised by detect_questions when its cancel_event is set."""
+
 class MCQQuestionSplitter:
-    def __init__(self, slide_duration=None):
-        self.temp_dir = tempfile.mkdtemp()
+    def __init__(self, slide_duration=None, verbose=True):
+        self._temp_dir = None  # Created on first use, journaled batch runs never need it
         self.slide_duration = slide_duration  # Can be None for manual slide control
+        self.verbose = verbose  # Previews detect quietly so the processing log stays clean
+        self.cancel_event = threading.Event()
         self.template_path = TemplateManager.get_template_path()
 
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    @property
+    def temp_dir(self):
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp()
+        return self._temp_dir
+
+    def read_page_features(self, page):
+        """Read the char count, dominant font and question-number glyph of a pdfium page.
+
+        pdfium extracts text without pdfminer's layout analysis, so this costs a
+        fraction of a second for a whole paper.
+        """
+        textpage = page.get_textpage()
+        try:
+            char_count = textpage.count_chars()
+            width = page.get_width()
+            font_buffer = ctypes.create_string_buffer(256)
+            fonts = {}
+            has_question_number = False
+            previous = '\n'
+
+            for index in range(char_count):
+                char = chr(pdfium_c.FPDFText_GetUnicode(textpage.raw, index))
+                pdfium_c.FPDFText_GetFontInfo(textpage.raw, index, font_buffer, len(font_buffer), None)
+                font = font_buffer.value.decode('utf-8', 'replace')
+                fonts[font] = fonts.get(font, 0) + 1
+
+                # A question number starts a line at the left margin
+                if not has_question_number and char.isdigit() and previous in '\r\n':
+                    if textpage.get_charbox(index)[0] < width * 0.15:
+                        has_question_number = True
+                previous = char
+
+            return {
+                'chars': char_count,
+                'blank_marker': 'BLANK PAGE' in textpage.get_text_range(),
+                'font': max(fonts, key=fonts.get) if fonts else None,
+                'question_number': has_question_number
+            }
+        finally:
+            textpage.close()
+
+    def classify_page(self, features, body_font, seen_question):
+        """Classify a page as 'blank', 'question', 'cover', 'continuation' or 'non-question'."""
+        if features['chars'] == 0 or features['blank_marker']:
+            return 'blank'
+        if features['question_number']:
+            return 'question'
+        # Pages before the first numbered question are the cover and instructions
+        if not seen_question:
+            return 'cover'
+        # Pages in the body font may hold the options of a question from the previous page;
+        # anything else (data sheets, periodic tables, copyright pages) never holds questions
+        if features['font'] == body_font:
+            return 'continuation'
+        return 'non-question'
+
+    def classify_pages(self, pdf_path):
+        """Classify every page of a PDF before running question detection."""
+        with PDFIUM_LOCK:
+            doc = pdfium.PdfDocument(pdf_path)
+            try:
+                features = []
+                for page_num in range(len(doc)):
+                    page = doc[page_num]
+                    try:
+                        features.append(self.read_page_features(page))
+                    finally:
+                        page.close()
+            finally:
+                doc.close()
+
+        # The body font is the dominant font of the pages holding questions
+        page_fonts = [f['font'] for f in features if f['question_number'] and f['font']]
+        body_font = max(set(page_fonts), key=page_fonts.count) if page_fonts else None
+
+        kinds = []
+        for page_features in features:
+            kinds.append(self.classify_page(page_features, body_font, 'question' in kinds))
+
+        summary = ', '.join(f"{kind}: {kinds.count(kind)}" for kind in dict.fromkeys(kinds))
+        self.log(f"Page classification ({summary})")
+        for page_num, kind in enumerate(kinds):
+            if kind not in ('question', 'continuation'):
+                self.log(f"Skipping page {page_num + 1}: {kind}")
+        return kinds
+
     def detect_questions(self, pdf_path):
         """Detect questions with consistent formatting and clear boundaries."""
         questions = []
         current_question = None
         expected_question = 1
         reference_formatting = None
-        
+        options_cnt = 0
+
+        page_kinds = self.classify_pages(pdf_path)
+
         with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages[1:], 1):  # Start from page 0
+            for page_num, page in enumerate(pdf.pages):
+                if self.cancel_event.is_set():
+                    raise DetectionCancelled()
+
+                # Only run full detection on pages that can hold questions; continuation
+                # pages matter only while a question is still waiting for its options
+                kind = page_kinds[page_num]
+                if kind == 'continuation':
+                    if not current_question or options_cnt >= 4:
+                        continue
+                elif kind != 'question':
+                    continue
+
                 # Extract words with their properties
                 words = page.extract_words(
                     keep_blank_chars=True,
@@ -130,7 +392,7 @@ class MCQQuestionSplitter:
                         }
                         options_cnt = 0
                         expected_question += 1
-                        print(f"Found question {expected_question-1}: {line_text}")
+                        self.log(f"Found question {expected_question-1}: {line_text}")
                     
                     elif current_question and line_text != " " and options_cnt < 4:
                         # Capture all content between questions
@@ -155,64 +417,80 @@ class MCQQuestionSplitter:
 
         return questions
 
-    def capture_question_image(self, pdf_path, question, questions):
+    def get_capture_bbox(self, pdf, question, questions):
+        """Calculate the region of the question's page that capture_question_image crops."""
+        page = pdf.pages[question['page']]
+        
+        # Calculate initial boundary from current question
+        bbox = list(question['start_bbox'])
+        
+        # Find the next question that appears after this one
+        next_question = None
+        for q in questions:
+            if q['number'] == question['number'] + 1:
+                next_question = q
+                break
+        
+        # Update bbox based on content and next question position
+        for content in question['content']:
+            page_num, content_bbox, _ = content
+            
+            # If content is on a different page than the next question
+            # or if content appears before the next question on the same page
+            should_include = True
+            if next_question and page_num == next_question['page']:
+                if content_bbox[1] >= next_question['start_bbox'][1]:
+                    should_include = False
+            
+            if should_include:
+                bbox[0] = min(bbox[0], content_bbox[0])
+                bbox[1] = min(bbox[1], content_bbox[1])
+                bbox[2] = max(bbox[2], content_bbox[2])
+                bbox[3] = max(bbox[3], content_bbox[3])
+                # print(bbox)
+        
+        # If there's a next question on the same page, use its start position
+        # as the end boundary
+        if next_question and next_question['page'] == question['page']:
+            bbox[3] = next_question['start_bbox'][1] - 5  # Small gap
+            # print(next_question['start_bbox'][1], bbox[3])
+        elif question['page']+1 == len(pdf.pages):
+            bbox[3] = bbox[3] + 30
+        else:
+            # If this is the last question on the page, extend to bottom
+            # or if question continues to next page, extend to page bottom
+            bbox[3] = max(page.bbox[3] - 50, bbox[3])
+        
+        # Ensure reasonable width
+        bbox[2] = min(bbox[2] * 1.20, page.bbox[2])
+        
+        # Handle multi-page questions
+        # if next_question and next_question['page'] > question['page']:
+        #     # Capture full remaining page height for current page
+        #     bbox[3] = page.bbox[3]
+        
+        return bbox
+
+    def detect_question_regions(self, pdf_path):
+        """Detect questions and attach the capture bounds used for their slides."""
+        questions = self.detect_questions(pdf_path)
+        with pdfplumber.open(pdf_path) as pdf:
+            for question in questions:
+                question['capture_bbox'] = self.get_capture_bbox(pdf, question, questions)
+        return questions
+
+    def capture_question_image(self, pdf_path, question, questions, image_dir=None):
         """Capture entire question including images up until the next question starts."""
         with pdfplumber.open(pdf_path) as pdf:
             page = pdf.pages[question['page']]
-            
-            # Calculate initial boundary from current question
-            bbox = question['start_bbox'].copy()
-            
-            # Find the next question that appears after this one
-            next_question = None
-            for q in questions:
-                if q['number'] == question['number'] + 1:
-                    next_question = q
-                    break
-            
-            # Update bbox based on content and next question position
-            for content in question['content']:
-                page_num, content_bbox, _ = content
-                
-                # If content is on a different page than the next question
-                # or if content appears before the next question on the same page
-                should_include = True
-                if next_question and page_num == next_question['page']:
-                    if content_bbox[1] >= next_question['start_bbox'][1]:
-                        should_include = False
-                
-                if should_include:
-                    bbox[0] = min(bbox[0], content_bbox[0])
-                    bbox[1] = min(bbox[1], content_bbox[1])
-                    bbox[2] = max(bbox[2], content_bbox[2])
-                    bbox[3] = max(bbox[3], content_bbox[3])
-                    # print(bbox)
-            
-            # If there's a next question on the same page, use its start position
-            # as the end boundary
-            if next_question and next_question['page'] == question['page']:
-                bbox[3] = next_question['start_bbox'][1] - 5  # Small gap
-                # print(next_question['start_bbox'][1], bbox[3])
-            elif question['page']+1 == len(pdf.pages):
-                bbox[3] = bbox[3] + 30
-            else:
-                # If this is the last question on the page, extend to bottom
-                # or if question continues to next page, extend to page bottom
-                bbox[3] = max(page.bbox[3] - 50, bbox[3])
-            
-            # Ensure reasonable width
-            bbox[2] = min(bbox[2] * 1.20, page.bbox[2])
-            
-            # Handle multi-page questions
-            # if next_question and next_question['page'] > question['page']:
-            #     # Capture full remaining page height for current page
-            #     bbox[3] = page.bbox[3]
+            bbox = self.get_capture_bbox(pdf, question, questions)
             
             # Render page to image
-            img = page.crop(bbox).to_image(resolution=200)
+            with PDFIUM_LOCK:
+                img = page.crop(bbox).to_image(resolution=200)
             
             # Save to temporary file
-            img_path = os.path.join(self.temp_dir, f'question_{question["number"]}.png')
+            img_path = os.path.join(image_dir or self.temp_dir, f'question_{question["number"]}.png')
             img.save(img_path)
             return img_path
 
@@ -283,8 +561,12 @@ class MCQQuestionSplitter:
         slide.shapes.add_picture(img_path, left, top, width=width, height=height)
         return slide
 
-    def convert_pdf_to_slides(self, pdf_path, output_filename="mcq_presentation.pptx"):
-        """Convert PDF MCQ paper to PowerPoint presentation with individual questions."""        
+    def convert_pdf_to_slides(self, pdf_path, output_filename="mcq_presentation.pptx", journal=None):
+        """Convert PDF MCQ paper to PowerPoint presentation with individual questions.
+
+        When a BatchJournal is given, detected questions and captured images are kept
+        so a rerun after a crash resumes from the last finished question.
+        """
         try:
             # Create presentation
             prs = Presentation(self.template_path)
@@ -297,21 +579,43 @@ class MCQQuestionSplitter:
                     output_filename = os.path.basename(pdf_path)[:-4] + '_mcq.pptx'
                 title_slide.shapes.placeholders[1].text = os.path.basename(pdf_path)
 
-            # Detect questions
-            questions = self.detect_questions(pdf_path)
-            
+            # Detect questions, reusing the journal's results from an interrupted run
+            questions = journal.get_questions(pdf_path) if journal else None
+            if questions is None:
+                questions = self.detect_questions(pdf_path)
+                if journal:
+                    journal.record_questions(pdf_path, questions)
+
+            image_dir = None
+            done = set()
+            if journal:
+                image_dir = journal.work_dir(pdf_path)
+                os.makedirs(image_dir, exist_ok=True)
+                done = journal.completed_questions(pdf_path)
+
             # Process each question
+            failed_questions = []
             for question in tqdm(questions, desc='Processing questions', unit='q'):
                 try:
-                    img_path = self.capture_question_image(pdf_path, question, questions)
+                    img_path = os.path.join(image_dir or self.temp_dir, f'question_{question["number"]}.png')
+                    if question['number'] not in done or not os.path.exists(img_path):
+                        img_path = self.capture_question_image(pdf_path, question, questions, image_dir)
+                        if journal:
+                            journal.mark_question(pdf_path, question['number'])
                     slide = self.create_slide_with_question(prs, img_path, question['number'])
                     self.set_slide_timing(slide, self.slide_duration)
                 except Exception as e:
-                    print(f"Error processing question {question['number']}: {str(e)}")
+                    self.log(f"Error processing question {question['number']}: {str(e)}")
+                    failed_questions.append(question['number'])
+
+            # In a batch, an incomplete presentation must not count as done; the finished
+            # questions are in the journal so a rerun only redoes the failed ones
+            if journal and failed_questions:
+                raise RuntimeError(f"questions {', '.join(map(str, failed_questions))} failed")
             
             # Save presentation
             prs.save(output_filename)
-            print(f"Presentation saved as {output_filename}")
+            self.log(f"Presentation saved as {output_filename}")
             
         finally:
             # Cleanup temporary files
@@ -319,6 +623,8 @@ class MCQQuestionSplitter:
 
     def cleanup(self):
         """Clean up temporary files."""
+        if self._temp_dir is None:
+            return
         for file in os.listdir(self.temp_dir):
             try:
                 os.remove(os.path.join(self.temp_dir, file))
@@ -329,19 +635,139 @@ class MCQQuestionSplitter:
         except:
             pass
 
+class _QueueWriter:
+    """Stand-in for sys.stdout in a worker process that sends output back to the parent."""
+    def __init__(self, message_queue):
+        self.message_queue = message_queue
+
+    def write(self, text):
+        if text:
+            self.message_queue.put(('log', text))
+
+    def flush(self):
+        pass
+
+def _convert_worker(pdf_path, output_path, slide_duration, journal_path, message_queue):
+    """Convert a single file inside a child process and report the outcome."""
+    # The parent's stdout may be a GUI widget or missing entirely in the windowed build
+    sys.stdout = _QueueWriter(message_queue)
+    if sys.stderr is None:
+        sys.stderr = open(os.devnull, 'w')
+    try:
+        journal = BatchJournal(journal_path)
+        converter = MCQQuestionSplitter(slide_duration=slide_duration)
+        converter.convert_pdf_to_slides(pdf_path, output_path, journal=journal)
+        message_queue.put(('result', None))
+    except Exception as e:
+        message_queue.put(('result', str(e)))
+
+def run_batch(input_dir, output_dir, slide_duration=None, timeout=300, journal_path=None):
+    """Convert every PDF in input_dir, resuming from the journal of an earlier run.
+
+    Each file runs in a child process that is killed after `timeout` seconds.
+    Failed files are recorded in the journal and retried after the remaining files,
+    so one bad PDF never stalls the queue. Returns the list of files that still failed.
+    """
+    if journal_path is None:
+        journal_path = os.path.join(output_dir, '.mcq_batch_journal.json')
+    journal = BatchJournal(journal_path)
+
+    pdf_files = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith('.pdf'))
+    # Files that failed in an earlier run go to the back of the queue
+    retry_list = set(journal.failed_files())
+    pdf_files.sort(key=lambda path: os.path.abspath(path) in retry_list)
+
+    # Always spawn: forking from the GUI would copy Tk and any lock held by a preview thread
+    context = multiprocessing.get_context('spawn')
+
+    failed = []
+    for i, pdf_path in enumerate(pdf_files, 1):
+        name = os.path.basename(pdf_path)
+        output_path = os.path.join(output_dir, f"{os.path.splitext(name)[0]}_mcq.pptx")
+
+        if journal.is_completed(pdf_path, output_path):
+            print(f"[{i}/{len(pdf_files)}] Skipping {name}: already completed")
+            continue
+
+        print(f"[{i}/{len(pdf_files)}] Processing {name}...")
+        message_queue = context.Queue()
+        process = context.Process(
+            target=_convert_worker,
+            args=(pdf_path, output_path, slide_duration, journal_path, message_queue),
+            daemon=True
+        )
+        process.start()
+        deadline = time.monotonic() + timeout
+
+        # Forward the worker's log lines until it reports a result, dies or runs out of time
+        while True:
+            if time.monotonic() > deadline:
+                process.terminate()
+                error = f"timed out after {timeout} seconds"
+                break
+            try:
+                kind, value = message_queue.get(timeout=0.1)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                # The worker may have posted its result just before exiting
+                error = f"worker exited with code {process.exitcode}"
+                while True:
+                    try:
+                        kind, value = message_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if kind == 'log':
+                        sys.stdout.write(value)
+                    else:
+                        error = value
+                break
+            if kind == 'log':
+                sys.stdout.write(value)
+            else:
+                error = value
+                break
+        process.join()
+
+        # The child wrote per-question progress; pick it up before recording the result
+        journal.load()
+        if error is None:
+            journal.mark_completed(pdf_path, output_path)
+            print(f"Successfully processed {name}")
+        else:
+            journal.mark_failed(pdf_path, error)
+            failed.append(pdf_path)
+            print(f"Error processing {name}: {error}")
+
+    if failed:
+        print(f"{len(failed)} file(s) failed and will be retried on the next run:")
+        for pdf_path in failed:
+            attempts = journal.lookup(pdf_path).get('attempts', 1)
+            print(f"  {os.path.basename(pdf_path)} (failed {attempts} time(s))")
+    return failed
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Convert PDF MCQ paper to PowerPoint presentation')
-    parser.add_argument('pdf_path', help='Path to the PDF file')
+    parser.add_argument('pdf_path', help='Path to the PDF file, or a directory of PDFs for batch processing')
     parser.add_argument('--output', '-o', default='mcq_presentation.pptx',
-                      help='Output PowerPoint file name (default: mcq_presentation.pptx)')
+                      help='Output PowerPoint file name, or output directory in batch mode (default: mcq_presentation.pptx)')
     parser.add_argument('--seconds', '-s', type=int, default=None,
                       help='Number of seconds each slide should display (default: None for manual control)')
+    parser.add_argument('--timeout', '-t', type=int, default=300,
+                      help='Batch mode: seconds allowed per file before it is skipped and retried later (default: 300)')
     
     args = parser.parse_args()
+
+    if os.path.isdir(args.pdf_path):
+        output_dir = args.pdf_path if args.output == 'mcq_presentation.pptx' else args.output
+        os.makedirs(output_dir, exist_ok=True)
+        failed = run_batch(args.pdf_path, output_dir, args.seconds, args.timeout)
+        sys.exit(1 if failed else 0)
     
     converter = MCQQuestionSplitter(slide_duration=args.seconds)
     converter.convert_pdf_to_slides(args.pdf_path, args.output)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -6,8 +6,10 @@ import threading
 import queue
 from pathlib import Path
 import sys
+import multiprocessing
+from PIL import ImageTk
 
-from MCQQuestionSplitter import MCQQuestionSplitter
+from MCQQuestionSplitter import MCQQuestionSplitter, DetectionCancelled, PreviewRenderer, run_batch
 
 class LogRedirector:
     def __init__(self, text_widget, queue):
@@ -20,6 +22,251 @@ class LogRedirector:
     def flush(self):
         pass
 
+class PreviewWindow:
+    """Low resolution preview of a PDF with the detected question regions drawn on top.
+
+    Pages are rendered lazily on a background thread as they scroll into view, and
+    question detection runs on its own thread so the pages appear straight away.
+    """
+    PAGE_GAP = 10
+    OVERLAY_COLORS = {
+        'content': '#3b8ed0',
+        'start': '#2fa84f',
+        'capture': '#e04343'
+    }
+
+    def __init__(self, parent, pdf_path):
+        self.pdf_path = pdf_path
+        self.closed = False
+
+        self.window = ctk.CTkToplevel(parent)
+        self.window.title(f"Preview - {os.path.basename(pdf_path)}")
+        self.window.geometry("520x760")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.status_label = ctk.CTkLabel(self.window, text="Loading pages...")
+        self.status_label.pack(anchor=tk.W, padx=10, pady=5)
+
+        legend_label = ctk.CTkLabel(
+            self.window,
+            text="Green: question start    Blue: question content    Red: captured slide region"
+        )
+        legend_label.pack(anchor=tk.W, padx=10)
+
+        canvas_frame = ctk.CTkFrame(self.window)
+        canvas_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.scrollbar = ctk.CTkScrollbar(canvas_frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.canvas = tk.Canvas(canvas_frame, background="#808080", highlightthickness=0,
+                                yscrollcommand=self.scrollbar.set)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda event: self.update_visible_pages())
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll(1))
+
+        self.page_offsets = []
+        self.page_sizes = []
+        self.scale = None
+        self.questions = None
+
+        # Pages currently wanted on screen, and the images drawn for them
+        self.visible_pages = set()
+        self.pending_pages = set()
+        self.page_images = {}
+
+        self.render_requests = queue.Queue()
+        self.results = queue.Queue()
+        # Detection stays quiet so it does not mix into the main processing log
+        self.converter = MCQQuestionSplitter(verbose=False)
+        threading.Thread(target=self.render_worker, daemon=True).start()
+        self.detect_thread = threading.Thread(target=self.detect_worker, daemon=True)
+        self.detect_thread.start()
+        self.check_results()
+
+    def render_worker(self):
+        """Render requested pages; the renderer is only ever touched by this thread."""
+        try:
+            renderer = PreviewRenderer(self.pdf_path)
+        except Exception as e:
+            self.results.put(('error', f"Could not open PDF: {str(e)}"))
+            return
+
+        try:
+            self.results.put(('sizes', renderer.page_sizes(), renderer.scale))
+            while True:
+                page_num = self.render_requests.get()
+                if page_num is None:
+                    break
+                # Skip pages that scrolled out of view while waiting in the queue
+                if page_num not in self.visible_pages:
+                    self.results.put(('skipped', page_num))
+                    continue
+                self.results.put(('page', page_num, renderer.render_page(page_num)))
+        except Exception as e:
+            self.results.put(('error', f"Error rendering preview: {str(e)}"))
+        finally:
+            renderer.close()
+
+    def detect_worker(self):
+        try:
+            questions = self.converter.detect_question_regions(self.pdf_path)
+            if not self.closed:
+                self.results.put(('questions', questions))
+        except DetectionCancelled:
+            pass
+        except Exception as e:
+            if not self.closed:
+                self.results.put(('error', f"Error detecting questions: {str(e)}"))
+        finally:
+            self.converter.cleanup()
+
+    def check_results(self):
+        if self.closed:
+            return
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if result[0] == 'sizes':
+                self.layout_pages(result[1], result[2])
+            elif result[0] == 'page':
+                self.draw_page(result[1], result[2])
+            elif result[0] == 'skipped':
+                self.pending_pages.discard(result[1])
+                # The page may have scrolled back into view while the skip was in flight
+                if result[1] in self.visible_pages:
+                    self.update_visible_pages()
+            elif result[0] == 'questions':
+                self.questions = result[1]
+                self.status_label.configure(text=f"Found {len(self.questions)} questions")
+                self.draw_overlays()
+            elif result[0] == 'error':
+                self.status_label.configure(text=result[1])
+        self.window.after(50, self.check_results)
+
+    def layout_pages(self, page_sizes, scale):
+        """Reserve space for every page so the scrollbar is right before anything is rendered."""
+        self.page_sizes = page_sizes
+        self.scale = scale
+
+        y = self.PAGE_GAP
+        max_width = 0
+        for page_num, (width, height) in enumerate(page_sizes):
+            self.page_offsets.append(y)
+            self.canvas.create_rectangle(
+                self.PAGE_GAP, y, self.PAGE_GAP + width * scale, y + height * scale,
+                fill="white", outline=""
+            )
+            self.canvas.create_text(
+                self.PAGE_GAP + width * scale / 2, y + height * scale / 2,
+                text=f"Page {page_num + 1}", fill="#808080"
+            )
+            y += height * scale + self.PAGE_GAP
+            max_width = max(max_width, width * scale)
+
+        self.canvas.configure(scrollregion=(0, 0, max_width + 2 * self.PAGE_GAP, y))
+        if self.questions is None:
+            self.status_label.configure(text="Detecting questions...")
+        else:
+            self.draw_overlays()
+        self.update_visible_pages()
+
+    def update_visible_pages(self):
+        """Request pages that scrolled into view and release the ones that left it."""
+        if not self.page_offsets:
+            return
+
+        # Keep half a screen above and below loaded so scrolling stays smooth
+        view_height = self.canvas.winfo_height()
+        top = self.canvas.canvasy(0) - view_height / 2
+        bottom = self.canvas.canvasy(view_height) + view_height / 2
+
+        visible = set()
+        for page_num, offset in enumerate(self.page_offsets):
+            height = self.page_sizes[page_num][1] * self.scale
+            if offset + height >= top and offset <= bottom:
+                visible.add(page_num)
+        self.visible_pages = visible
+
+        for page_num in list(self.page_images):
+            if page_num not in visible:
+                self.canvas.delete(f"page{page_num}")
+                del self.page_images[page_num]
+
+        for page_num in sorted(visible):
+            if page_num not in self.page_images and page_num not in self.pending_pages:
+                self.pending_pages.add(page_num)
+                self.render_requests.put(page_num)
+
+    def draw_page(self, page_num, img):
+        self.pending_pages.discard(page_num)
+        if page_num not in self.visible_pages:
+            return
+
+        photo = ImageTk.PhotoImage(img)
+        self.page_images[page_num] = photo
+        self.canvas.create_image(
+            self.PAGE_GAP, self.page_offsets[page_num],
+            image=photo, anchor=tk.NW, tags=("page", f"page{page_num}")
+        )
+        # Keep the question regions above the page images
+        self.canvas.tag_raise("overlay")
+
+    def to_canvas(self, page_num, bbox):
+        x0, top, x1, bottom = bbox
+        offset = self.page_offsets[page_num]
+        return (self.PAGE_GAP + x0 * self.scale, offset + top * self.scale,
+                self.PAGE_GAP + x1 * self.scale, offset + bottom * self.scale)
+
+    def draw_overlays(self):
+        if self.questions is None or not self.page_offsets:
+            return
+
+        for question in self.questions:
+            for page_num, bbox, _ in question['content'][1:]:
+                self.canvas.create_rectangle(
+                    *self.to_canvas(page_num, bbox),
+                    outline=self.OVERLAY_COLORS['content'], tags=("overlay",)
+                )
+
+            self.canvas.create_rectangle(
+                *self.to_canvas(question['page'], question['start_bbox']),
+                outline=self.OVERLAY_COLORS['start'], width=2, tags=("overlay",)
+            )
+
+            x0, top, x1, bottom = self.to_canvas(question['page'], question['capture_bbox'])
+            self.canvas.create_rectangle(
+                x0, top, x1, bottom,
+                outline=self.OVERLAY_COLORS['capture'], width=2, dash=(4, 2), tags=("overlay",)
+            )
+            self.canvas.create_text(
+                x1 - 2, top + 2, text=f"Q{question['number']}", anchor=tk.NE,
+                fill=self.OVERLAY_COLORS['capture'], font=("Arial", 9, "bold"), tags=("overlay",)
+            )
+
+    def on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self.update_visible_pages()
+
+    def on_mousewheel(self, event):
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def scroll(self, direction):
+        self.canvas.yview_scroll(direction * 3, "units")
+        self.update_visible_pages()
+
+    def close(self):
+        self.closed = True
+        self.render_requests.put(None)
+        # Detection stops at the next page instead of running on for the rest of the paper
+        self.converter.cancel_event.set()
+        self.window.destroy()
+
 class MCQSplitterGUI:
     def __init__(self):
         self.window = ctk.CTk()
@@ -32,6 +279,7 @@ class MCQSplitterGUI:
         
         # Queue for log messages
         self.log_queue = queue.Queue()
+        self.preview_window = None
         self.setup_gui()
         self.check_log_queue()
 
@@ -129,6 +377,15 @@ class MCQSplitterGUI:
             "Select where to save the PowerPoint presentation"
         )
 
+        # Preview detection before paying for the full conversion
+        self.preview_button = ctk.CTkButton(
+            self.single_file_frame,
+            text="Preview Detection",
+            command=self.open_preview,
+            width=150
+        )
+        self.preview_button.pack(anchor=tk.E, padx=10, pady=5)
+
     def setup_batch_processing(self):
         # Input directory
         self.create_file_selection(
@@ -148,6 +405,28 @@ class MCQSplitterGUI:
             "Select directory for output PPTX files"
         )
 
+        # Per-file timeout
+        timeout_frame = ctk.CTkFrame(self.batch_frame)
+        timeout_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        timeout_label = ctk.CTkLabel(timeout_frame, text="Timeout per file:", width=120)
+        timeout_label.pack(side=tk.LEFT, padx=5)
+
+        self.batch_timeout_entry = ctk.CTkEntry(timeout_frame, width=100)
+        self.batch_timeout_entry.insert(0, "300")
+        self.batch_timeout_entry.pack(side=tk.LEFT, padx=5)
+
+        seconds_label = ctk.CTkLabel(timeout_frame, text="seconds")
+        seconds_label.pack(side=tk.LEFT, padx=5)
+
+        help_btn = ctk.CTkButton(
+            timeout_frame,
+            text="?",
+            width=30,
+            command=lambda: self.show_help("Files taking longer than this are stopped and retried on the next run. Completed files are skipped when a batch is restarted.")
+        )
+        help_btn.pack(side=tk.LEFT, padx=5)
+
     def create_file_selection(self, parent, label_text, path_attr, browse_command, help_text):
         frame = ctk.CTkFrame(parent)
         frame.pack(fill=tk.X, padx=5, pady=5)
@@ -236,6 +515,21 @@ class MCQSplitterGUI:
         else:
             self.time_entry.configure(state="disabled")
 
+    def open_preview(self):
+        input_path = self.input_path.get()
+        if not input_path or not os.path.exists(input_path):
+            messagebox.showerror("Error", "Please select an input PDF file to preview")
+            return
+        # Only one preview at a time, each one renders and detects on its own threads
+        if self.preview_window and not self.preview_window.closed:
+            self.preview_window.window.focus()
+            return
+        # A closed preview's detection stops at its next page; don't start a second one meanwhile
+        if self.preview_window and self.preview_window.detect_thread.is_alive():
+            messagebox.showinfo("Preview", "The previous preview is still stopping. Please try again in a moment.")
+            return
+        self.preview_window = PreviewWindow(self.window, input_path)
+
     def show_help(self, message):
         messagebox.showinfo("Help", message)
 
@@ -312,21 +606,27 @@ class MCQSplitterGUI:
                 messagebox.showerror("Error", "Please select input and output directories")
                 self.process_button.configure(state="normal")
                 return
+
+            try:
+                timeout = int(self.batch_timeout_entry.get())
+                if timeout <= 0:
+                    raise ValueError("Timeout must be positive")
+            except ValueError:
+                messagebox.showerror("Error", "Please enter a valid timeout in seconds")
+                self.process_button.configure(state="normal")
+                return
             
             def process_batch():
-                pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
-                total_files = len(pdf_files)
-                
-                for i, file in enumerate(pdf_files, 1):
-                    pdf_path = os.path.join(input_dir, file)
-                    output_path = os.path.join(output_dir, f"{os.path.splitext(file)[0]}_mcq.pptx")
-                    
-                    self.process_single_file(pdf_path, output_path, seconds)
+                # Completed files are read from the journal in output_dir and skipped
+                failed = run_batch(input_dir, output_dir, seconds, timeout)
                 
                 self.log_text.insert(tk.END, "\nBatch processing completed\n")
                 self.process_button.configure(state="normal")
                 
-                messagebox.showinfo("File processing completed successfully!")
+                if failed:
+                    messagebox.showwarning("Completed with errors", f"{len(failed)} file(s) failed. Start processing again to retry them.")
+                else:
+                    messagebox.showinfo("Success", "File processing completed successfully!")
 
             threading.Thread(target=process_batch, daemon=True).start()
         
@@ -362,5 +662,6 @@ class MCQSplitterGUI:
         self.window.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = MCQSplitterGUI()
     app.run()
\ No newline at end of file